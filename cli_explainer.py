@@ -1,73 +1,38 @@
-import subprocess
+import asyncio
+import dataclasses
+import hashlib
 import os
-from typing import Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING
 
-from pydantic import BaseModel
-from pydantic_ai import Agent, RunContext
-from pydantic_ai.models.openai import OpenAIModel
-from rich.console import Console
-from rich.markdown import Markdown
-from rich.panel import Panel
+from tools import get_help_text, get_man_page
 
-import logfire
+# pydantic_ai, httpx and logfire are only imported by _build_agent, which main() runs in a worker
+# thread so they load while the user types the first tool name.
+if TYPE_CHECKING:
+    from concurrent.futures import Future
 
-logfire.configure(send_to_logfire='if-token-present')
-logfire.instrument_openai()
+    from pydantic_ai import Agent, RunContext
+    from pydantic_ai.agent import AgentRunResult
+    from pydantic_ai.messages import ModelMessage
 
-class CLIQuery(BaseModel):
+@dataclasses.dataclass
+class CLIQuery:
     tool_name: str
+    # Set once a question about this tool has been answered, so its help text is already in the history
+    explored: bool = False
 
-ollama_model = OpenAIModel(model_name='llama3.2', base_url=os.getenv('OLLAMA_API_BASE'))
-agent = Agent(
-    deps_type=CLIQuery,
-    model=ollama_model,
-    retries=3,
-)
+def system_prompt(ctx: 'RunContext[CLIQuery]'):
+    if ctx.deps.explored:
+        return f"""
+You are a CLI tool expert answering a follow-up question about a command-line tool.
 
-@agent.tool
-def get_help_text(ctx: RunContext[CLIQuery], cli_tool_name: str, subcommand: Optional[str] = None) -> str:
-    """Gets help text for a tool or subcommand using the '-h' flag.
+Use the help text already in the conversation above to answer. If what you need isn't there, call `get_help_text` or `get_man_page` for it; never call a tool with inputs you have already used in this conversation.
 
-    Args:
-        cli_tool_name: The name of the CLI tool.
-        subcommand: The subcommand (optional).
-    """
-    try:
-        command = [cli_tool_name]
-        if subcommand:
-            command.append(subcommand)
-        command.append("-h")
-        result = subprocess.run(command, capture_output=True, text=True, check=False)
-
-        if result.returncode == 0:
-            return result.stdout
-        else:
-            return f"Error: {result.stderr}"
-
-    except FileNotFoundError:
-        return f"Error: Command '{cli_tool_name}' not found."
-
-@agent.tool
-def get_man_page(ctx: RunContext[CLIQuery], cli_tool_name: str) -> str:
-    """Gets the man page for a tool.
-
-    Args:
-      tool_name: the name of the tool
-    """
-    try:
-        command = ["man", cli_tool_name]
-        result = subprocess.run(command, capture_output=True, text=True, check=False)
-
-        if result.returncode == 0:
-            return result.stdout
-        else:
-            return f"Error getting man page: {result.stderr}"
-
-    except FileNotFoundError:
-        return "Error: 'man' command not found.  Is it installed?"
-
-@agent.system_prompt
-def system_prompt(ctx: RunContext[CLIQuery]):
+Users Query:
+Tool: {ctx.deps.tool_name}
+"""
     return f"""
 You are a CLI tool expert. You are tasked with explaining how to use a given command-line tool, based on a user's query.
 
@@ -91,57 +56,181 @@ Tool: {ctx.deps.tool_name}
 """
 
 
-def run_chat_interface(agent: Agent):
+def _build_agent() -> 'Agent[CLIQuery, str]':
+    """Creates the agent backed by the local Ollama model and registers its tools."""
+    import httpx
+    from pydantic_ai import Agent
+    from pydantic_ai.models.openai import OpenAIModel
+
+    # Only pay for tracing (and the global OpenAI client patch) when it can actually be exported.
+    if os.getenv('LOGFIRE_TOKEN'):
+        import logfire
+
+        logfire.configure(send_to_logfire='if-token-present')
+        logfire.instrument_openai()
+    else:
+        # pydantic-ai still opens logfire spans; without this each run prints a "not configured" warning
+        os.environ.setdefault('LOGFIRE_IGNORE_NO_CONFIG', '1')
+
+    # One pooled client for every model round-trip. Keep idle connections to Ollama around between
+    # questions rather than httpx's default 5s, so a follow-up doesn't pay for a fresh connection.
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(max_connections=32, max_keepalive_connections=32, keepalive_expiry=300),
+        timeout=httpx.Timeout(600, connect=5),
+    )
+    ollama_model = OpenAIModel(model_name='llama3.2', base_url=os.getenv('OLLAMA_API_BASE'), http_client=http_client)
+    agent = Agent(
+        deps_type=CLIQuery,
+        model=ollama_model,
+        retries=3,
+    )
+    agent.tool_plain(get_help_text)
+    agent.tool_plain(get_man_page)
+    # Dynamic so follow-up runs swap the full strategy in the history for the short variant
+    agent.system_prompt(dynamic=True)(system_prompt)
+    return agent
+
+
+def _follow_up_history(prev_result: 'AgentRunResult[str]') -> list['ModelMessage']:
+    """Builds the history for a follow-up question: the system prompt plus the previous exchange only.
+
+    Resending every earlier answer would grow the prompt with each question. The dynamic system prompt
+    part is carried over (new_messages() only has it after the first question) so it can be swapped
+    for the short variant.
+    """
+    from pydantic_ai.messages import ModelRequest, SystemPromptPart
+
+    messages = prev_result.new_messages()
+    first_request = prev_result.all_messages()[0]
+    if messages[0] is not first_request:
+        system_parts = [part for part in first_request.parts if isinstance(part, SystemPromptPart)]
+        messages = [ModelRequest(parts=system_parts), *messages]
+    return messages
+
+
+def _dedupe_tool_returns(messages: list['ModelMessage']) -> list['ModelMessage']:
+    """Replaces repeated tool outputs in the history with a reference to their first occurrence.
+
+    Help text is byte-identical across calls, so an exact content hash is enough.
+    """
+    from pydantic_ai.messages import ModelRequest, ToolReturnPart
+
+    seen: set[str] = set()
+    deduped: list[ModelMessage] = []
+    for message in messages:
+        if isinstance(message, ModelRequest):
+            parts = []
+            for part in message.parts:
+                if isinstance(part, ToolReturnPart) and isinstance(part.content, str):
+                    digest = hashlib.blake2b(part.content.encode(), digest_size=16).hexdigest()
+                    if digest in seen:
+                        part = dataclasses.replace(part, content=f"<see earlier: sha={digest}>")
+                    else:
+                        seen.add(digest)
+                parts.append(part)
+            message = dataclasses.replace(message, parts=parts)
+        deduped.append(message)
+    return deduped
+
+
+def _run_on(loop: asyncio.AbstractEventLoop, coro):
+    """Runs a coroutine on the background event loop and blocks until it finishes.
+
+    Ctrl-C while waiting cancels the task and waits for it to unwind (stopping tool calls and
+    killing their subprocesses) before re-raising KeyboardInterrupt to the caller.
+    """
+    done = threading.Event()
+    tasks: list[asyncio.Task] = []
+
+    def start():
+        tasks.append(loop.create_task(coro))
+        tasks[0].add_done_callback(lambda _: done.set())
+
+    loop.call_soon_threadsafe(start)
+    try:
+        done.wait()
+    except KeyboardInterrupt:
+        loop.call_soon_threadsafe(lambda: tasks[0].cancel())
+        done.wait()
+        raise
+    return tasks[0].result()
+
+
+def run_chat_interface(agent_future: 'Future[Agent[CLIQuery, str]]'):
+    from rich.console import Console
+    from rich.markdown import Markdown
+    from rich.panel import Panel
+
     console = Console()
     console.print(Panel("[bold]CLI Tool Explainer[/bold]", border_style="green"))
 
-    while True:
-        try:
-            # First get the tool name
-            tool_name = console.input("[bold]Enter the CLI tool name (or 'quit' to exit):[/bold] ")
-            if tool_name.lower() == "quit":
-                break
+    # Tool calls and model requests run on an event loop in a background thread, so prefetches keep
+    # going while the prompts below block, and Ctrl-C keeps raising KeyboardInterrupt in this thread.
+    loop = asyncio.new_event_loop()
+    loop_thread = threading.Thread(target=loop.run_forever, daemon=True)
+    loop_thread.start()
 
-            console.print(f"\n[bold]Now asking questions about: {tool_name}[/bold]")
-            
-            prev_result = None
-            
-            # Inner loop for questions about the same tool
-            while True:
-                try:
-                    query = console.input("\n[bold]Enter your question (or 'switch' to change tool, 'quit' to exit):[/bold] ")
-                    
-                    if query.lower() == "quit":
-                        return  # Exit the entire program
-                    if query.lower() == "switch":
-                        break  # Break inner loop to switch tools
-
-                    cli_query = CLIQuery(tool_name=tool_name)
-
-                    with console.status("Thinking..."):
-                        final_result = agent.run_sync(query, message_history=prev_result.new_messages() if prev_result else [], deps=cli_query)
-
-                    # Store the Q&A in conversation history
-                    prev_result = final_result
-                    console.print(
-                        Panel(Markdown(final_result.data), title="Explanation", border_style="blue")
-                    )
-
-                except KeyboardInterrupt:
-                    console.print("\n[bold]Switching tools...[/bold]")
+    try:
+        while True:
+            try:
+                # First get the tool name
+                tool_name = console.input("[bold]Enter the CLI tool name (or 'quit' to exit):[/bold] ")
+                if tool_name.lower() == "quit":
                     break
 
-        except KeyboardInterrupt:
-            console.print("\n[bold]Exiting...[/bold]")
-            break
-        except Exception as e:
-            console.print(f"[red]An error occurred: {e}[/red]")
+                console.print(f"\n[bold]Now asking questions about: {tool_name}[/bold]")
+
+                # Start fetching the top-level help while the user types their question; the agent
+                # almost always asks for it first.
+                prefetch = asyncio.run_coroutine_threadsafe(get_help_text(tool_name), loop)
+
+                prev_result = None
+
+                # Inner loop for questions about the same tool
+                while True:
+                    try:
+                        query = console.input("\n[bold]Enter your question (or 'switch' to change tool, 'quit' to exit):[/bold] ")
+
+                        if query.lower() == "quit":
+                            return  # Exit the entire program
+                        if query.lower() == "switch":
+                            break  # Break inner loop to switch tools
+
+                        cli_query = CLIQuery(tool_name=tool_name, explored=prev_result is not None)
+
+                        # Make sure the prefetched help is in the cache before the agent asks for it
+                        prefetch.result()
+
+                        message_history = _dedupe_tool_returns(_follow_up_history(prev_result)) if prev_result else []
+
+                        with console.status("Thinking..."):
+                            final_result = _run_on(loop, agent_future.result().run(query, message_history=message_history, deps=cli_query))
+
+                        # Store the Q&A in conversation history
+                        prev_result = final_result
+                        console.print(
+                            Panel(Markdown(final_result.data), title="Explanation", border_style="blue")
+                        )
+
+                    except KeyboardInterrupt:
+                        console.print("\n[bold]Switching tools...[/bold]")
+                        break
+
+            except KeyboardInterrupt:
+                console.print("\n[bold]Exiting...[/bold]")
+                break
+            except Exception as e:
+                console.print(f"[red]An error occurred: {e}[/red]")
+    finally:
+        loop.call_soon_threadsafe(loop.stop)
+        loop_thread.join()
 
 
 def main():
     """Main function to run the application."""
-    run_chat_interface(agent)
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        run_chat_interface(executor.submit(_build_agent))
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
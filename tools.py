@@ -0,0 +1,278 @@
+"""Tools the agent uses to read a CLI's documentation: `-h` help text and man pages."""
+import asyncio
+import hashlib
+import os
+import platform
+import re
+import shutil
+import signal
+import tempfile
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+# Memory backstop for a single pipe; man pages like bash(1) run to ~350 KB. The model only ever sees
+# MAX_MODEL_TOKENS worth of it (see _prep_for_model).
+MAX_OUTPUT_BYTES = 256 * 1024
+
+# ANSI escapes plus the "X\bX" / "_\bX" overstrike sequences man emits for bold and underline.
+ANSI_RE = re.compile(r'\x1b\[[0-9;]*[A-Za-z]|.\x08')
+WS_RE = re.compile(r'\n{3,}')
+
+# Budget for one tool result in the model context (llama3.2 is run with an 8K window), at a rough
+# 4 characters per token.
+MAX_MODEL_TOKENS = 2048
+CHARS_PER_TOKEN = 4
+OMITTED_MARKER = "\n...[omitted]...\n"
+
+# Render man pages as wide, unpaged plain text: the model doesn't care about line wrapping,
+# and this keeps groff from emitting bold/underline sequences we'd only strip again.
+MAN_ENV = {
+    **os.environ,
+    'MANPAGER': 'cat',
+    'MANWIDTH': '10000',
+    'COLUMNS': '10000',
+    'MAN_KEEP_FORMATTING': '',
+    'GROFF_NO_SGR': '1',
+}
+
+# Seconds to wait before killing a hung `-h` (e.g. a tool that reads stdin) or `man` (e.g. a stray pager).
+HELP_TIMEOUT = 5
+MAN_TIMEOUT = 10
+
+# Top-level help longer than this is treated as complete enough that the man page isn't worth rendering.
+DENSE_HELP_CHARS = 1500
+
+# Rendered man pages persist across runs here, since the in-process caches die with the REPL.
+MAN_CACHE_DIR = Path(os.getenv('XDG_CACHE_HOME') or Path.home() / '.cache') / 'cli_explain' / 'man'
+# Bump when _prep_for_model changes what it does to a page, so older cached renders are not reused.
+MAN_CACHE_FORMAT = 1
+
+_help_cache: dict[tuple[str, Optional[str]], str] = {}
+_man_cache: dict[str, str] = {}
+
+async def _read_capped(stream: asyncio.StreamReader) -> bytes:
+    """Drains a pipe to EOF, keeping at most MAX_OUTPUT_BYTES so a huge page never sits in memory whole.
+
+    The start and a rolling window of the end are kept, with OMITTED_MARKER where the middle was
+    dropped, so the head+tail trim in _prep_for_model still sees the real tail (e.g. EXAMPLES).
+    """
+    half = MAX_OUTPUT_BYTES // 2
+    head = bytearray()
+    tail = bytearray()
+    dropped = False
+    while chunk := await stream.read(64 * 1024):
+        taken = chunk[:half - len(head)]
+        head += taken
+        tail += chunk[len(taken):]
+        if len(tail) > half:
+            del tail[:len(tail) - half]
+            dropped = True
+    if dropped:
+        return bytes(head) + OMITTED_MARKER.encode() + bytes(tail)
+    return bytes(head + tail)
+
+async def _run(
+    command: list[str],
+    timeout: float,
+    env: Optional[dict[str, str]] = None,
+    executable: Optional[str] = None,
+) -> tuple[int, str, str]:
+    """Runs a command without blocking the event loop, returning (returncode, stdout, stderr).
+
+    `executable` is the resolved path to run; argv[0] stays as given, so tools that print their own
+    name in usage lines show `git`, not `/usr/bin/git`.
+
+    Both pipes are drained in 64 KiB reads into buffers capped at MAX_OUTPUT_BYTES, and each is
+    decoded once at the end. If the command outlives `timeout`, its whole process group (e.g. man's
+    groff/pager children) is killed and TimeoutError is raised, naming the command. A cancelled
+    call kills it too.
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *command,
+        # Never share the terminal: a prefetched `-h` runs while the user is typing at the prompt
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        limit=64 * 1024,
+        env=env,
+        start_new_session=True,
+        executable=executable,
+    )
+    try:
+        out, err, _ = await asyncio.wait_for(
+            asyncio.gather(_read_capped(proc.stdout), _read_capped(proc.stderr), proc.wait()), timeout
+        )
+    except (TimeoutError, asyncio.CancelledError) as e:
+        # Also on cancellation (Ctrl-C mid-answer), so no stray man/groff is left running
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        await proc.wait()
+        if isinstance(e, TimeoutError):
+            raise TimeoutError(f"'{' '.join(command)}' timed out after {timeout}s") from None
+        raise
+    return proc.returncode, out.decode(errors="replace"), err.decode(errors="replace")
+
+@lru_cache(maxsize=64)
+def _resolve(cli_tool_name: str) -> str:
+    """Resolves a tool to its absolute path once, instead of searching $PATH on every exec."""
+    path = shutil.which(cli_tool_name)
+    if not path:
+        raise FileNotFoundError(cli_tool_name)
+    return path
+
+def _trim_head(head: str) -> str:
+    """Ends a kept head at the last line break, else space, in its final tenth; otherwise leaves it as is."""
+    start = len(head) - len(head) // 10
+    for sep in ("\n", " "):
+        cut = head.rfind(sep, start)
+        if cut > 0:
+            return head[:cut]
+    return head
+
+def _trim_tail(tail: str) -> str:
+    """Starts a kept tail after the first line break, else space, in its first tenth; otherwise leaves it as is."""
+    end = len(tail) // 10
+    for sep in ("\n", " "):
+        cut = tail.find(sep, 0, end)
+        if cut >= 0:
+            return tail[cut + 1:]
+    return tail
+
+def _prep_for_model(text: str, max_tokens: int = MAX_MODEL_TOKENS) -> str:
+    """Strips terminal formatting and trims long output before it goes into the model context.
+
+    Output over the budget keeps its first three quarters and last quarter, since subcommand lists
+    are usually near the top and EXAMPLES near the end. Each cut moves to a nearby line break or
+    space, but never so far that a very wide line throws away most of what was kept.
+    """
+    text = WS_RE.sub("\n\n", ANSI_RE.sub("", text))
+    budget = max_tokens * CHARS_PER_TOKEN
+    if len(text) > budget:
+        head = _trim_head(text[:budget * 3 // 4])
+        tail = _trim_tail(text[-(budget // 4):])
+        text = head + OMITTED_MARKER + tail
+    return text
+
+async def _run_help(cli_tool_name: str, subcommand: Optional[str] = None) -> str:
+    """Runs `<tool> [subcommand] -h`, memoized for the life of the process."""
+    key = (cli_tool_name, subcommand or None)
+    if key in _help_cache:
+        return _help_cache[key]
+    try:
+        command = [cli_tool_name]
+        if subcommand:
+            command.append(subcommand)
+        command.append("-h")
+        returncode, stdout, stderr = await _run(command, HELP_TIMEOUT, executable=_resolve(cli_tool_name))
+
+        if returncode == 0:
+            output = _prep_for_model(stdout)
+        else:
+            output = f"Error: {stderr}"
+
+    except FileNotFoundError:
+        output = f"Error: Command '{cli_tool_name}' not found."
+    except TimeoutError:
+        # Not cached: a slow first run (cold disk, busy machine) shouldn't stick for the whole session
+        return f"Error: Command '{cli_tool_name}' timed out after {HELP_TIMEOUT}s."
+
+    _help_cache[key] = output
+    return output
+
+async def _man_cache_path(man: str, cli_tool_name: str) -> Optional[Path]:
+    """Returns the on-disk cache file for a tool's rendered man page.
+
+    The key covers everything the cached text depends on: the page's source file and its mtime (so
+    upgrading the tool, or the kernel for section 2 pages, invalidates it), the render width, and the
+    _prep_for_model budget and format. `man -w` only locates the page, it doesn't run groff.
+    Files are named `<tool digest>-<key digest>.txt` so stale renders of a tool can be pruned.
+    """
+    returncode, stdout, _ = await _run(["man", "-w", cli_tool_name], HELP_TIMEOUT, env=MAN_ENV, executable=man)
+    if returncode != 0 or not stdout.strip():
+        return None
+    source = stdout.splitlines()[0].strip()
+    try:
+        mtime = os.stat(source).st_mtime_ns
+    except OSError:
+        return None
+    settings = f"{MAN_CACHE_FORMAT}:{MAN_ENV['MANWIDTH']}:{MAX_MODEL_TOKENS}:{CHARS_PER_TOKEN}"
+    tool_digest = hashlib.blake2b(cli_tool_name.encode(), digest_size=8).hexdigest()
+    key = hashlib.blake2b(f"{platform.release()}:{source}:{mtime}:{settings}".encode(), digest_size=16).hexdigest()
+    return MAN_CACHE_DIR / f"{tool_digest}-{key}.txt"
+
+def _store_man_render(cache_path: Path, output: str):
+    """Writes a render to the disk cache and drops the tool's older renders. Best-effort."""
+    tool_digest = cache_path.name.partition("-")[0]
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename, so a concurrent run or a crash mid-write never leaves a truncated page
+        fd, tmp = tempfile.mkstemp(dir=cache_path.parent, prefix=f"{tool_digest}-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(output)
+            os.replace(tmp, cache_path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        for stale in cache_path.parent.glob(f"{tool_digest}-*.txt"):
+            if stale != cache_path:
+                stale.unlink(missing_ok=True)
+    except OSError:
+        pass
+
+async def _run_man(cli_tool_name: str) -> str:
+    """Runs `man <tool>`, memoized for the life of the process and cached on disk across runs."""
+    if cli_tool_name in _man_cache:
+        return _man_cache[cli_tool_name]
+    try:
+        man = _resolve("man")
+        cache_path = await _man_cache_path(man, cli_tool_name)
+        try:
+            output = cache_path.read_text() if cache_path else None
+        except OSError:
+            output = None
+
+        if output is None:
+            returncode, stdout, stderr = await _run(["man", cli_tool_name], MAN_TIMEOUT, env=MAN_ENV, executable=man)
+
+            if returncode == 0:
+                output = _prep_for_model(stdout)
+                if cache_path:
+                    _store_man_render(cache_path, output)
+            else:
+                output = f"Error getting man page: {stderr}"
+
+    except FileNotFoundError:
+        output = "Error: 'man' command not found.  Is it installed?"
+    except TimeoutError as e:
+        # Either the `man -w` lookup or the render itself; the message names which. Not cached, so
+        # the next call tries again.
+        return f"Error getting man page: {e}."
+
+    _man_cache[cli_tool_name] = output
+    return output
+
+async def get_help_text(cli_tool_name: str, subcommand: Optional[str] = None) -> str:
+    """Gets help text for a tool or subcommand using the '-h' flag.
+
+    Args:
+        cli_tool_name: The name of the CLI tool.
+        subcommand: The subcommand (optional).
+    """
+    return await _run_help(cli_tool_name, subcommand)
+
+async def get_man_page(cli_tool_name: str) -> str:
+    """Gets the man page for a tool.
+
+    Args:
+      tool_name: the name of the tool
+    """
+    help_text = _help_cache.get((cli_tool_name, None), "")
+    if len(help_text) > DENSE_HELP_CHARS and not help_text.startswith("Error"):
+        # The help may not be in this run's history (follow-ups only carry the previous exchange),
+        # so hand it back rather than just a note pointing at it
+        return f"The man page was skipped because the help text is already detailed:\n\n{help_text}"
+    return await _run_man(cli_tool_name)